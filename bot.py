@@ -1,88 +1,177 @@
 import asyncio
 import datetime
+import functools
 import json
 import logging
 import os
+import signal
 import time
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
 
+import aiohttp
 from aiohttp import web
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from cachetools import TTLCache
-from requests import get  # Add this import at the top
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram.ext import AIORateLimiter, Application, CommandHandler, ContextTypes
 
 from config import (
+    ADMIN_USER_IDS,
     LOG_FILE,
     LOG_FORMAT,
+    SELF_PING_URL,
     TELEGRAM_BOT_TOKEN,
-    set_stock_update_callback,
     update_default_stocks,
 )
 from database import Database
 from stock_service import StockService
 
-# Configure logging
-logging.basicConfig(
-    format=LOG_FORMAT,
-    level=logging.INFO,
-    handlers=[logging.FileHandler(LOG_FILE), logging.StreamHandler()],
+# Configure logging: one shared formatter, and a size-capped log file that
+# is only opened on the first write
+log_formatter = logging.Formatter(LOG_FORMAT)
+file_handler = RotatingFileHandler(
+    LOG_FILE, maxBytes=5_000_000, backupCount=3, delay=True
 )
+file_handler.setFormatter(log_formatter)
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(log_formatter)
+logging.basicConfig(level=logging.INFO, handlers=[file_handler, stream_handler])
 logger = logging.getLogger(__name__)
 
-# Initialize database and scheduler
+# Initialize database
 db = Database()
-scheduler = AsyncIOScheduler()
 
-# Rate limiting cache: user_id -> last_command_time
-command_cache = TTLCache(maxsize=1000, ttl=60)  # 1 minute cooldown
+# Shared HTTP session for all outbound aiohttp requests, created in main_async
+HTTP_SESSION: aiohttp.ClientSession | None = None
+
+# Rate limiting: user_id -> last_command_time, pruned lazily once it grows large
+command_cache: dict[int, float] = {}
+COMMAND_CACHE_TTL = 60
+COMMAND_CACHE_MAX_SIZE = 10_000
+
+# Health check response cache: absorbs bursts of probes
+_health_cache = TTLCache(maxsize=1, ttl=15)
+
+# Subscription cache: user_id -> subscribed stocks
+_subs_cache = TTLCache(maxsize=10_000, ttl=30)
+
+# Number of users the scheduled update sends to at the same time
+BROADCAST_WORKERS = 30
+
+# Last broadcast sent to each user: user_id -> hash of the message text
+_last_broadcast: dict[str, int] = {}
+
+# Welcome and help text shared by /start and /help
+_WELCOME_MSG = (
+    "👋 Welcome to the Stock Price Notification Bot!\n\n"
+    "I'll help you monitor stock prices of major tech companies. Here are my commands:\n\n"
+    "/subscribe SYMBOL - Subscribe to a stock (e.g., /subscribe AAPL)\n"
+    "/unsubscribe SYMBOL - Unsubscribe from a stock\n"
+    "/check SYMBOL - Check current stock price\n"
+    "/list - List all your subscribed stocks\n"
+    "/frequency HOURS - Set notification frequency\n"
+    "/help - Show this help message\n\n"
+    "You're currently subscribed to receive updates every 2 hours for major tech stocks."
+)
+
 
+def rate_limit_decorator(func=None, *, cooldown: float = 3):
+    """Decorator to apply rate limiting to commands.
 
-def rate_limit_decorator(func):
-    """Decorator to apply rate limiting to commands."""
+    Can be used bare (``@rate_limit_decorator``) or with a custom cooldown
+    in seconds (``@rate_limit_decorator(cooldown=10)``).
+    """
+    if func is None:
+        return functools.partial(rate_limit_decorator, cooldown=cooldown)
 
+    @functools.wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         current_time = time.time()
 
         # Check if user has issued a command recently
-        if user_id in command_cache:
-            last_time = command_cache[user_id]
-            if current_time - last_time < 3:  # 3 seconds between commands
-                await update.message.reply_text(
-                    "Please wait a moment before using another command."
-                )
-                return
+        last_time = command_cache.get(user_id, 0.0)
+        if current_time - last_time < cooldown:
+            await update.message.reply_text(
+                "Please wait a moment before using another command."
+            )
+            return
 
-        # Update cache and proceed
+        # Update cache, dropping stale entries in one sweep when it gets large
         command_cache[user_id] = current_time
+        if len(command_cache) > COMMAND_CACHE_MAX_SIZE:
+            cutoff = current_time - COMMAND_CACHE_TTL
+            for uid in [uid for uid, t in command_cache.items() if t < cutoff]:
+                del command_cache[uid]
+
+        return await func(update, context)
+
+    return wrapper
+
+
+def admin_only(func):
+    """Decorator to restrict commands to the users listed in ADMIN_USER_IDS."""
+
+    @functools.wraps(func)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if str(update.effective_user.id) not in ADMIN_USER_IDS:
+            await update.message.reply_text("This command is only available to admins.")
+            return
+
         return await func(update, context)
 
     return wrapper
 
 
+def subs_cached(user_id: str) -> List[str]:
+    """Get a user's subscribed stocks, served from the cache when fresh."""
+    stocks = _subs_cache.get(user_id)
+    if stocks is None:
+        stocks = db.get_subscribed_stocks(user_id)
+        _subs_cache[user_id] = stocks
+    return stocks
+
+
+async def cached_validate(symbol: str) -> bool:
+    """Validate a stock symbol without blocking the event loop.
+
+    StockService caches validation results.
+    """
+    results = await StockService.validate_many([symbol])
+    return results[0]
+
+
+async def cached_info(symbol: str) -> Optional[Dict]:
+    """Get stock info for a symbol without blocking the event loop.
+
+    StockService serves fresh symbols from its own cache.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, StockService.get_stock_info, symbol)
+
+
+async def cached_multiple_info(symbols: List[str]) -> Dict[str, Dict]:
+    """Get stock info for several symbols without blocking the event loop.
+
+    StockService only fetches the symbols missing from its cache.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, StockService.get_multiple_stocks_info, symbols
+    )
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a welcome message when the command /start is issued."""
-    welcome_message = (
-        "👋 Welcome to the Stock Price Notification Bot!\n\n"
-        "I'll help you monitor stock prices of major tech companies. Here are my commands:\n\n"
-        "/subscribe SYMBOL - Subscribe to a stock (e.g., /subscribe AAPL)\n"
-        "/unsubscribe SYMBOL - Unsubscribe from a stock\n"
-        "/check SYMBOL - Check current stock price\n"
-        "/list - List all your subscribed stocks\n"
-        "/frequency HOURS - Set notification frequency\n"
-        "/updatestocks SYMBOL1 SYMBOL2 ... - Update the default stock list\n"
-        "/help - Show this help message\n\n"
-        "You're currently subscribed to receive updates every 2 hours for major tech stocks."
-    )
-    await update.message.reply_text(welcome_message)
+    await update.message.reply_text(_WELCOME_MSG)
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a help message when the command /help is issued."""
-    await start(update, context)
+    await update.message.reply_text(_WELCOME_MSG)
 
 
+@rate_limit_decorator
 async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Subscribe to a stock symbol."""
     if not context.args:
@@ -95,16 +184,18 @@ async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = str(update.effective_user.id)
 
     # Validate the stock symbol
-    if not StockService.validate_stock_symbol(symbol):
+    if not await cached_validate(symbol):
         await update.message.reply_text(f"Invalid stock symbol: {symbol}")
         return
 
     if db.subscribe_stock(user_id, symbol):
+        _subs_cache.pop(user_id, None)
         await update.message.reply_text(f"Successfully subscribed to {symbol}")
     else:
         await update.message.reply_text(f"You're already subscribed to {symbol}")
 
 
+@rate_limit_decorator
 async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Unsubscribe from a stock symbol."""
     if not context.args:
@@ -117,6 +208,7 @@ async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     user_id = str(update.effective_user.id)
 
     if db.unsubscribe_stock(user_id, symbol):
+        _subs_cache.pop(user_id, None)
         await update.message.reply_text(f"Successfully unsubscribed from {symbol}")
     else:
         await update.message.reply_text(f"You're not subscribed to {symbol}")
@@ -128,19 +220,20 @@ async def check(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = str(update.effective_user.id)
     if not context.args:
         # No arguments: show all subscribed stocks
-        stocks = db.get_subscribed_stocks(user_id)
+        stocks = subs_cached(user_id)
         if not stocks:
             await update.message.reply_text("You're not subscribed to any stocks.")
             return
 
-        stocks_info = StockService.get_multiple_stocks_info(stocks)
+        stocks_info = await cached_multiple_info(stocks)
         if not stocks_info:
             await update.message.reply_text("Could not fetch data for your stocks.")
             return
 
-        message = "📊 Current Stock Prices\n\n"
-        for symbol, info in stocks_info.items():
-            message += StockService.format_stock_message(info) + "\n"
+        body = "\n".join(
+            StockService.format_stock_message(info) for info in stocks_info.values()
+        )
+        message = f"📊 Current Stock Prices\n\n{body}"
 
         await update.message.reply_text(message)
         return
@@ -148,23 +241,24 @@ async def check(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     symbol = context.args[0].upper()
 
     if symbol == "ALL":
-        stocks = db.get_subscribed_stocks(user_id)
+        stocks = subs_cached(user_id)
         if not stocks:
             await update.message.reply_text("You're not subscribed to any stocks.")
             return
 
-        stocks_info = StockService.get_multiple_stocks_info(stocks)
+        stocks_info = await cached_multiple_info(stocks)
         if not stocks_info:
             await update.message.reply_text("Could not fetch data for your stocks.")
             return
 
-        message = "📊 Current Stock Prices\n\n"
-        for symbol, info in stocks_info.items():
-            message += StockService.format_stock_message(info) + "\n"
+        body = "\n".join(
+            StockService.format_stock_message(info) for info in stocks_info.values()
+        )
+        message = f"📊 Current Stock Prices\n\n{body}"
 
         await update.message.reply_text(message)
     else:
-        stock_info = StockService.get_stock_info(symbol)
+        stock_info = await cached_info(symbol)
         if stock_info:
             message = StockService.format_stock_message(stock_info)
             await update.message.reply_text(message)
@@ -172,22 +266,23 @@ async def check(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             await update.message.reply_text(f"Could not fetch data for {symbol}")
 
 
+@rate_limit_decorator
 async def list_stocks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List all subscribed stocks."""
     user_id = str(update.effective_user.id)
-    stocks = db.get_subscribed_stocks(user_id)
+    stocks = subs_cached(user_id)
 
     if not stocks:
         await update.message.reply_text("You're not subscribed to any stocks.")
         return
 
-    message = "Your subscribed stocks:\n\n"
-    for symbol in stocks:
-        message += f"• {symbol}\n"
+    body = "\n".join(f"• {symbol}" for symbol in stocks)
+    message = f"Your subscribed stocks:\n\n{body}"
 
     await update.message.reply_text(message)
 
 
+@rate_limit_decorator
 async def set_frequency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Set notification frequency in hours."""
     if not context.args:
@@ -197,14 +292,7 @@ async def set_frequency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         return
 
     try:
-        hours = float(context.args[0])
-
-        # More comprehensive validation
-        if not hours.is_integer():
-            await update.message.reply_text("Frequency must be an integer.")
-            return
-
-        hours = int(hours)
+        hours = int(context.args[0])
         if hours < 1 or hours > 24:
             await update.message.reply_text("Frequency must be between 1 and 24 hours.")
             return
@@ -214,9 +302,13 @@ async def set_frequency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.reply_text(f"Notification frequency set to {hours} hours.")
 
     except ValueError:
-        await update.message.reply_text("Please provide a valid number of hours.")
+        await update.message.reply_text(
+            "Please provide a valid whole number of hours."
+        )
 
 
+@admin_only
+@rate_limit_decorator(cooldown=10)
 async def update_stocks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Update the default stocks list."""
     if not context.args:
@@ -225,17 +317,12 @@ async def update_stocks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         )
         return
 
-    # Check if user is admin (you might want to add proper admin check)
-    user_id = str(update.effective_user.id)
-
     # Convert all symbols to uppercase
     new_stocks = [symbol.upper() for symbol in context.args]
 
-    # Validate all stock symbols
-    invalid_symbols = []
-    for symbol in new_stocks:
-        if not StockService.validate_stock_symbol(symbol):
-            invalid_symbols.append(symbol)
+    # Validate all stock symbols concurrently
+    results = await StockService.validate_many(new_stocks)
+    invalid_symbols = [symbol for symbol, ok in zip(new_stocks, results) if not ok]
 
     if invalid_symbols:
         await update.message.reply_text(
@@ -246,6 +333,8 @@ async def update_stocks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
     # Update the default stocks list
     update_default_stocks(new_stocks)
+    # Every user's subscriptions may have changed
+    _subs_cache.clear()
 
     await update.message.reply_text(
         f"Default stocks list updated successfully.\n"
@@ -253,75 +342,135 @@ async def update_stocks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     )
 
 
+@admin_only
+@rate_limit_decorator(cooldown=10)
+async def clear_cache(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Forget cached invalid stock symbols so they are checked again."""
+    StockService.clear_negative_cache()
+    await update.message.reply_text("Cleared the invalid stock symbol cache.")
+
+
+@admin_only
+@rate_limit_decorator(cooldown=10)
+async def force_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a stock update to all users now, even if prices haven't changed."""
+    context.job_queue.run_once(send_stock_updates, when=0, data={"force": True})
+    await update.message.reply_text("Sending a stock update to all users.")
+
+
 async def send_stock_updates(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send stock updates to all users based on their preferences."""
-    for user_id in db.get_all_users():
-        stocks = db.get_subscribed_stocks(user_id)
-        if not stocks:
-            continue
+    """Send stock updates to all users based on their preferences.
 
-        stocks_info = StockService.get_multiple_stocks_info(stocks)
-        if not stocks_info:
-            continue
+    Users whose update would be identical to the last one sent are skipped,
+    unless the job was scheduled with ``{"force": True}`` as its data.
+    """
+    job_data = context.job.data if context.job else None
+    force = bool(job_data and job_data.get("force"))
 
-        message = "📊 Stock Price Update\n\n"
-        for symbol, info in stocks_info.items():
-            message += StockService.format_stock_message(info) + "\n"
+    all_symbols = db.get_all_subscribed_stocks()
+    if not all_symbols:
+        return
 
-        try:
-            await context.bot.send_message(chat_id=user_id, text=message)
-        except Exception as e:
-            logger.error(f"Error sending update to user {user_id}: {e}")
+    # Fetch every subscribed symbol once and share the results across users
+    info_map = await cached_multiple_info(list(all_symbols))
+    if not info_map:
+        return
+
+    # Format each symbol once, and each distinct subscription set once
+    line_cache = {
+        symbol: StockService.format_stock_message(info)
+        for symbol, info in info_map.items()
+    }
+    msg_cache: Dict[frozenset, Optional[str]] = {}
+
+    def _build_message(stocks: frozenset) -> Optional[str]:
+        lines = [line_cache[s] for s in sorted(stocks) if s in line_cache]
+        if not lines:
+            return None
+        body = "\n".join(lines)
+        return f"📊 Stock Price Update\n\n{body}"
+
+    async def _push(user_id: str) -> None:
+        key = frozenset(subs_cached(user_id))
+        if key not in msg_cache:
+            msg_cache[key] = _build_message(key)
+        message = msg_cache[key]
+        if message is None:
+            return
+
+        # Nothing has moved since this user's last update
+        message_hash = hash(message)
+        if not force and _last_broadcast.get(user_id) == message_hash:
+            return
+
+        # The application's rate limiter paces sends and retries on RetryAfter
+        await context.bot.send_message(chat_id=user_id, text=message)
+        _last_broadcast[user_id] = message_hash
+
+    # A fixed pool of workers streams users from the database, so memory stays
+    # flat however many users there are, and the pool size caps concurrent
+    # sends to stay clear of Telegram rate limits
+    users = db.iter_all_users()
+
+    async def _worker() -> None:
+        for user_id in users:
+            try:
+                await _push(user_id)
+            except Exception as e:
+                logger.error(
+                    "Error sending update to user %s: %s", user_id, e, exc_info=True
+                )
+
+    await asyncio.gather(*(_worker() for _ in range(BROADCAST_WORKERS)))
 
 
 async def health_check(request):
     """Enhanced health check endpoint."""
+    cached = _health_cache.get("v")
+    if cached is not None:
+        body, status = cached
+        return web.Response(text=body, content_type="application/json", status=status)
+
     try:
         # Verify database connection
-        db.get_all_users()
+        if not db.ping():
+            raise RuntimeError("Database ping failed")
 
-        # Check YFinance API
+        # Check YFinance API, reusing a cached price when one is fresh
         test_symbol = "AAPL"
-        stock_info = StockService.get_stock_info(test_symbol)
+        stock_info = await cached_info(test_symbol)
 
         if stock_info:
-            return web.Response(
-                text=json.dumps(
-                    {
-                        "status": "healthy",
-                        "database": "connected",
-                        "api": "connected",
-                        "timestamp": datetime.now().isoformat(),
-                    }
-                ),
-                content_type="application/json",
-                status=200,
+            body = json.dumps(
+                {
+                    "status": "healthy",
+                    "database": "connected",
+                    "api": "connected",
+                    "timestamp": datetime.datetime.now().isoformat(),
+                }
             )
         else:
-            return web.Response(
-                text=json.dumps(
-                    {
-                        "status": "degraded",
-                        "database": "connected",
-                        "api": "error",
-                        "timestamp": datetime.now().isoformat(),
-                    }
-                ),
-                content_type="application/json",
-                status=200,
-            )
-    except Exception as e:
-        return web.Response(
-            text=json.dumps(
+            body = json.dumps(
                 {
-                    "status": "unhealthy",
-                    "error": str(e),
-                    "timestamp": datetime.now().isoformat(),
+                    "status": "degraded",
+                    "database": "connected",
+                    "api": "error",
+                    "timestamp": datetime.datetime.now().isoformat(),
                 }
-            ),
-            content_type="application/json",
-            status=500,
+            )
+        status = 200
+    except Exception as e:
+        body = json.dumps(
+            {
+                "status": "unhealthy",
+                "error": str(e),
+                "timestamp": datetime.datetime.now().isoformat(),
+            }
         )
+        status = 500
+
+    _health_cache["v"] = (body, status)
+    return web.Response(text=body, content_type="application/json", status=status)
 
 
 async def start_web_server():
@@ -335,14 +484,26 @@ async def start_web_server():
     site = web.TCPSite(runner, "0.0.0.0", port)
     await site.start()
 
-    logger.info(f"Web server started on port {port}")
+    logger.info("Web server started on port %s", port)
     return runner
 
 
 async def main_async() -> None:
     """Async implementation of the bot's main function."""
+    global HTTP_SESSION
+
     # Create the Application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Handle updates concurrently so slow commands don't queue up others, and
+    # keep outgoing messages under the Bot API's limit of ~30 per second
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(True)
+        .rate_limiter(
+            AIORateLimiter(overall_max_rate=30, overall_time_period=1, max_retries=1)
+        )
+        .build()
+    )
 
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
@@ -353,33 +514,47 @@ async def main_async() -> None:
     application.add_handler(CommandHandler("list", list_stocks))
     application.add_handler(CommandHandler("frequency", set_frequency))
     application.add_handler(CommandHandler("updatestocks", update_stocks))
+    application.add_handler(CommandHandler("clearcache", clear_cache))
+    application.add_handler(CommandHandler("forceupdate", force_update))
 
-    # Set up stock update callback
-    set_stock_update_callback(db.refresh_default_stocks)
-
-    # Schedule periodic updates
-    scheduler.add_job(
-        send_stock_updates, "interval", minutes=120, args=[application]
-    )  # <-- changed from 14 to 120
+    # Schedule periodic updates every 2 hours on the application's job queue
+    application.job_queue.run_repeating(
+        send_stock_updates, interval=datetime.timedelta(hours=2), first=10
+    )
 
     # Schedule self-ping every 14 minutes (to keep Render.com alive)
-    scheduler.add_job(self_ping, "interval", minutes=14)
-
-    # Start the scheduler
-    scheduler.start()
+    application.job_queue.run_repeating(
+        self_ping, interval=datetime.timedelta(minutes=14), first=60
+    )
 
     # Set up webhook instead of polling to avoid conflicts
     webhook_url = os.environ.get("WEBHOOK_URL")
     port = int(os.environ.get("PORT", 8080))
 
-    # Start the web server in the same event loop
-    runner = await start_web_server()
+    # Stop on SIGTERM (sent by the hosting platform) or SIGINT
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop_event.set)
+    loop.add_signal_handler(signal.SIGINT, stop_event.set)
 
+    runner = None
+    initialized = False
     try:
+        HTTP_SESSION = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=10),
+            connector=aiohttp.TCPConnector(
+                limit=50, limit_per_host=20, keepalive_timeout=75
+            ),
+        )
+
+        # Start the web server in the same event loop
+        runner = await start_web_server()
+
+        await application.initialize()
+        initialized = True
+        await application.start()
         if webhook_url:
             # Use webhook mode when WEBHOOK_URL is provided
-            await application.initialize()
-            await application.start()
             await application.updater.start_webhook(
                 listen="0.0.0.0",
                 port=port,
@@ -387,44 +562,44 @@ async def main_async() -> None:
                 webhook_url=f"{webhook_url}/{TELEGRAM_BOT_TOKEN}",
                 allowed_updates=Update.ALL_TYPES,
             )
-            logger.info(f"Bot started in webhook mode on port {port}")
-
-            # Keep the application running
-            while True:
-                await asyncio.sleep(3600)  # Sleep for an hour
+            logger.info("Bot started in webhook mode on port %s", port)
         else:
             # Fallback to polling mode for local development
-            await application.initialize()
-            await application.start()
             await application.updater.start_polling(
                 allowed_updates=Update.ALL_TYPES,
                 drop_pending_updates=True,  # Important: Drop pending updates to avoid conflicts
             )
             logger.info("Bot started in polling mode")
 
-            # Keep the application running
-            while True:
-                await asyncio.sleep(3600)  # Sleep for an hour
-    except (KeyboardInterrupt, SystemExit):
-        # Shutdown gracefully
-        scheduler.shutdown()
-        await application.stop()
-        await runner.cleanup()
-
-
-SELF_PING_URL = os.environ.get(
-    "SELF_PING_URL"
-)  # Add this after your other config loads
-
-
-def self_ping():
+        # Keep the application running until a shutdown signal arrives
+        await stop_event.wait()
+    finally:
+        # Shutdown gracefully, undoing only the steps that completed, and
+        # release local resources even if the Telegram shutdown fails
+        try:
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+            if initialized:
+                await application.shutdown()
+        finally:
+            if runner is not None:
+                await runner.cleanup()
+            if HTTP_SESSION is not None:
+                await HTTP_SESSION.close()
+            db.close()
+
+
+async def self_ping(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Ping the server itself to prevent idling (for Render.com)."""
-    if SELF_PING_URL:
+    if SELF_PING_URL and HTTP_SESSION:
         try:
-            get(SELF_PING_URL, timeout=10)
+            async with HTTP_SESSION.get(SELF_PING_URL) as response:
+                await response.read()
             logger.info("Self-ping successful.")
         except Exception as e:
-            logger.warning(f"Self-ping failed: {e}")
+            logger.warning("Self-ping failed: %s", e)
 
 
 def main() -> None:
@@ -435,7 +610,7 @@ def main() -> None:
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.error(f"Error in main function: {e}")
+        logger.error("Error in main function: %s", e)
         raise
 
 
@@ -1,4 +1,5 @@
 import os
+import time
 
 from dotenv import load_dotenv
 
@@ -20,6 +21,16 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN must be set in .env file")
 
+# URL the bot pings to keep the host awake (optional, e.g. on Render.com)
+SELF_PING_URL = os.getenv("SELF_PING_URL")
+
+# Telegram user IDs allowed to run admin commands (optional, comma-separated)
+ADMIN_USER_IDS = {
+    user_id.strip()
+    for user_id in os.getenv("ADMIN_USER_IDS", "").split(",")
+    if user_id.strip()
+}
+
 # Default notification frequency in hours
 DEFAULT_NOTIFICATION_FREQUENCY = 2
 
@@ -35,30 +46,23 @@ DEFAULT_STOCKS = [
     "INTC",  # Intel
 ]
 
-# Callback function to be called when stocks are updated
-_stock_update_callback = None
+# Version of the default stocks list. Users whose stored epoch is older pick
+# up the new defaults lazily on their next read. Starts at 0 on every start;
+# update_default_stocks bumps it from the clock so it exceeds epochs stored
+# before a restart. Updated lists are not persisted: after a restart
+# DEFAULT_STOCKS is the hard-coded list again and new users get epoch 0.
+DEFAULTS_EPOCH = 0
 
 
 def update_default_stocks(new_stocks):
-    """Update the default stocks list and notify subscribers.
+    """Update the default stocks list and bump its epoch.
 
     Args:
         new_stocks: List of new stock symbols to set as default
     """
-    global DEFAULT_STOCKS, _stock_update_callback
+    global DEFAULT_STOCKS, DEFAULTS_EPOCH
     DEFAULT_STOCKS = [stock.upper() for stock in new_stocks]
-    if _stock_update_callback:
-        _stock_update_callback()
-
-
-def set_stock_update_callback(callback):
-    """Set the callback function to be called when stocks are updated.
-
-    Args:
-        callback: Function to be called when stocks are updated
-    """
-    global _stock_update_callback
-    _stock_update_callback = callback
+    DEFAULTS_EPOCH = max(DEFAULTS_EPOCH + 1, time.time_ns())
 
 
 # Logging Configuration
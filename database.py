@@ -1,9 +1,12 @@
 import json
 import logging
 import os
-from typing import Dict, List, Set
-import shutil
-from config import DEFAULT_NOTIFICATION_FREQUENCY, DEFAULT_STOCKS
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Set
+
+import config
+from config import DEFAULT_NOTIFICATION_FREQUENCY
 
 logger = logging.getLogger(__name__)
 
@@ -11,44 +14,118 @@ logger = logging.getLogger(__name__)
 class Database:
     """Handles user data storage and retrieval for the stock notification bot."""
 
-    def __init__(self, db_file: str = "user_data.json"):
+    def __init__(
+        self, db_file: str = "user_data.db", json_file: str = "user_data.json"
+    ):
         """Initialize the database with the specified file.
 
         Args:
-            db_file: Path to the JSON file for storing user data
+            db_file: Path to the SQLite file for storing user data
+            json_file: Path to a legacy JSON database to import on first start
         """
         self.db_file = db_file
-        self.users: Dict[str, Dict] = {}
-        self.load_data()
-
-    def load_data(self) -> None:
-        """Load user data from the JSON file if it exists."""
-        if os.path.exists(self.db_file):
-            try:
-                with open(self.db_file, "r") as f:
-                    self.users = json.load(f)
-                logger.info(
-                    f"Loaded data for {len(self.users)} users from {self.db_file}"
-                )
-            except Exception as e:
-                logger.error(f"Error loading database: {e}")
-                # Initialize with empty dict if file is corrupted
-                self.users = {}
+        # Autocommit mode: single statements commit on their own and
+        # multi-statement changes use explicit transactions
+        self.conn = sqlite3.connect(db_file, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+        self.migrate_json(json_file)
+        # Warm-load each user's defaults epoch once, so reads need no existence
+        # or epoch query: user_id -> last default stocks epoch applied
+        self._user_epochs: Dict[str, int] = dict(
+            self.conn.execute("SELECT user_id, defaults_epoch FROM users")
+        )
+
+    def create_tables(self) -> None:
+        """Create the users and subscriptions tables if they don't exist."""
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                notification_frequency INTEGER NOT NULL,
+                defaults_epoch INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(users)")}
+        if "defaults_epoch" not in columns:
+            # Databases created before default-stock epochs were tracked
+            self.conn.execute(
+                "ALTER TABLE users ADD COLUMN defaults_epoch INTEGER NOT NULL DEFAULT 0"
+            )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                user_id TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                PRIMARY KEY (user_id, symbol)
+            ) WITHOUT ROWID
+            """
+        )
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run several statements as one transaction, rolling back on error."""
+        self.conn.execute("BEGIN")
+        try:
+            yield self.conn
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def migrate_json(self, json_file: str) -> None:
+        """Import users from a legacy JSON database into an empty database.
+
+        The JSON file is renamed afterwards so the import runs only once.
+
+        Args:
+            json_file: Path to the legacy JSON file
+        """
+        if not os.path.exists(json_file):
+            return
+        if self.conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            return
 
-    def save_data(self) -> None:
-        """Save user data to the JSON file."""
         try:
-            # Create a backup first
-            if os.path.exists(self.db_file):
-                backup_file = f"{self.db_file}.bak"
-                shutil.copy2(self.db_file, backup_file)
-
-            # Now save the new data
-            with open(self.db_file, "w") as f:
-                json.dump(self.users, f, indent=2)
-            logger.info(f"Saved data for {len(self.users)} users to {self.db_file}")
+            with open(json_file, "r") as f:
+                users = json.load(f)
+
+            with self.transaction() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO users VALUES (?, ?, ?)",
+                    (
+                        (
+                            user_id,
+                            user_data.get(
+                                "notification_frequency",
+                                DEFAULT_NOTIFICATION_FREQUENCY,
+                            ),
+                            config.DEFAULTS_EPOCH,
+                        )
+                        for user_id, user_data in users.items()
+                    ),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO subscriptions VALUES (?, ?)",
+                    (
+                        (user_id, symbol)
+                        for user_id, user_data in users.items()
+                        for symbol in user_data.get("subscribed_stocks", [])
+                    ),
+                )
+
+            os.replace(json_file, f"{json_file}.migrated")
+            logger.info(
+                f"Migrated {len(users)} users from {json_file} to {self.db_file}"
+            )
         except Exception as e:
-            logger.error(f"Error saving database: {e}")
+            logger.error(f"Error migrating database from {json_file}: {e}")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.conn.close()
 
     def get_user(self, user_id: str) -> Dict:
         """Get user data or create a new entry if user doesn't exist.
@@ -59,14 +136,48 @@ class Database:
         Returns:
             User data dictionary
         """
-        if user_id not in self.users:
-            # Initialize new user with default settings
-            self.users[user_id] = {
-                "subscribed_stocks": DEFAULT_STOCKS.copy(),
-                "notification_frequency": DEFAULT_NOTIFICATION_FREQUENCY,
-            }
-            self.save_data()
-        return self.users[user_id]
+        self._ensure_user(user_id)
+        row = self.conn.execute(
+            "SELECT notification_frequency FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        symbols = self.conn.execute(
+            "SELECT symbol FROM subscriptions WHERE user_id = ?", (user_id,)
+        )
+        return {
+            "subscribed_stocks": {symbol for (symbol,) in symbols},
+            "notification_frequency": row[0],
+        }
+
+    def _ensure_user(self, user_id: str) -> None:
+        """Create a user with default settings if they don't exist yet, and
+        add any default stocks published since the user was last seen.
+
+        _user_epochs mirrors the users table, so this is a dict lookup for
+        up-to-date users. All user inserts must go through here.
+        """
+        # Read through the module so updates to the default list are seen
+        epoch = config.DEFAULTS_EPOCH
+        user_epoch = self._user_epochs.get(user_id)
+        if user_epoch is not None and user_epoch >= epoch:
+            return
+
+        with self.transaction() as conn:
+            if user_epoch is None:
+                # Initialize new user with default settings
+                conn.execute(
+                    "INSERT OR IGNORE INTO users VALUES (?, ?, ?)",
+                    (user_id, DEFAULT_NOTIFICATION_FREQUENCY, epoch),
+                )
+            else:
+                conn.execute(
+                    "UPDATE users SET defaults_epoch = ? WHERE user_id = ?",
+                    (epoch, user_id),
+                )
+            conn.executemany(
+                "INSERT OR IGNORE INTO subscriptions VALUES (?, ?)",
+                ((user_id, symbol) for symbol in config.DEFAULT_STOCKS),
+            )
+        self._user_epochs[user_id] = epoch
 
     def subscribe_stock(self, user_id: str, stock_symbol: str) -> bool:
         """Subscribe a user to a stock.
@@ -78,15 +189,12 @@ class Database:
         Returns:
             True if newly subscribed, False if already subscribed
         """
-        user_data = self.get_user(user_id)
-        stock_symbol = stock_symbol.upper()
-
-        if stock_symbol in user_data["subscribed_stocks"]:
-            return False
-
-        user_data["subscribed_stocks"].append(stock_symbol)
-        self.save_data()
-        return True
+        self._ensure_user(user_id)
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO subscriptions VALUES (?, ?)",
+            (user_id, stock_symbol.upper()),
+        )
+        return cursor.rowcount > 0
 
     def unsubscribe_stock(self, user_id: str, stock_symbol: str) -> bool:
         """Unsubscribe a user from a stock.
@@ -98,15 +206,12 @@ class Database:
         Returns:
             True if unsubscribed, False if not subscribed
         """
-        user_data = self.get_user(user_id)
-        stock_symbol = stock_symbol.upper()
-
-        if stock_symbol not in user_data["subscribed_stocks"]:
-            return False
-
-        user_data["subscribed_stocks"].remove(stock_symbol)
-        self.save_data()
-        return True
+        self._ensure_user(user_id)
+        cursor = self.conn.execute(
+            "DELETE FROM subscriptions WHERE user_id = ? AND symbol = ?",
+            (user_id, stock_symbol.upper()),
+        )
+        return cursor.rowcount > 0
 
     def get_subscribed_stocks(self, user_id: str) -> List[str]:
         """Get list of stocks a user is subscribed to.
@@ -115,9 +220,14 @@ class Database:
             user_id: Telegram user ID
 
         Returns:
-            List of stock symbols
+            Sorted list of stock symbols
         """
-        return self.get_user(user_id)["subscribed_stocks"]
+        self._ensure_user(user_id)
+        rows = self.conn.execute(
+            "SELECT symbol FROM subscriptions WHERE user_id = ? ORDER BY symbol",
+            (user_id,),
+        )
+        return [symbol for (symbol,) in rows]
 
     def set_notification_frequency(self, user_id: str, hours: int) -> None:
         """Set notification frequency for a user.
@@ -129,9 +239,11 @@ class Database:
         if hours < 1:
             hours = 1  # Minimum 1 hour
 
-        user_data = self.get_user(user_id)
-        user_data["notification_frequency"] = hours
-        self.save_data()
+        self._ensure_user(user_id)
+        self.conn.execute(
+            "UPDATE users SET notification_frequency = ? WHERE user_id = ?",
+            (hours, user_id),
+        )
 
     def get_notification_frequency(self, user_id: str) -> int:
         """Get notification frequency for a user.
@@ -144,13 +256,31 @@ class Database:
         """
         return self.get_user(user_id)["notification_frequency"]
 
+    def ping(self) -> bool:
+        """Cheap liveness check for the database.
+
+        Returns:
+            True if the database answers a trivial query, False otherwise
+        """
+        return self.conn.execute("SELECT 1").fetchone() is not None
+
     def get_all_users(self) -> List[str]:
         """Get list of all user IDs.
 
         Returns:
             List of user IDs
         """
-        return list(self.users.keys())
+        rows = self.conn.execute("SELECT user_id FROM users")
+        return [user_id for (user_id,) in rows]
+
+    def iter_all_users(self) -> Iterator[str]:
+        """Iterate over all user IDs without building a list.
+
+        Yields:
+            User IDs
+        """
+        for (user_id,) in self.conn.execute("SELECT user_id FROM users"):
+            yield user_id
 
     def get_all_subscribed_stocks(self) -> Set[str]:
         """Get set of all unique stocks that any user is subscribed to.
@@ -158,19 +288,10 @@ class Database:
         Returns:
             Set of stock symbols
         """
-        all_stocks = set()
-        for user_id in self.users:
-            all_stocks.update(self.users[user_id]["subscribed_stocks"])
-        return all_stocks
-
-    def refresh_default_stocks(self) -> None:
-        """Update all users' subscribed stocks when default stocks change.
-        This ensures users stay subscribed to the current default stock list.
-        """
-        for user_id in self.users:
-            user_data = self.users[user_id]
-            # Add any new default stocks that aren't in the user's list
-            for stock in DEFAULT_STOCKS:
-                if stock not in user_data["subscribed_stocks"]:
-                    user_data["subscribed_stocks"].append(stock)
-        self.save_data()
+        rows = self.conn.execute("SELECT DISTINCT symbol FROM subscriptions")
+        symbols = {symbol for (symbol,) in rows}
+        # Users who haven't picked up the latest defaults will on their next read
+        epoch = config.DEFAULTS_EPOCH
+        if any(user_epoch < epoch for user_epoch in self._user_epochs.values()):
+            symbols.update(config.DEFAULT_STOCKS)
+        return symbols
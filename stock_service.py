@@ -1,22 +1,136 @@
+import asyncio
 import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import backoff
 import requests
 import yfinance as yf
+from cachetools import TTLCache, cached
 
 logger = logging.getLogger(__name__)
 
+# How long fetched stock information is reused, in seconds
+STOCK_INFO_TTL = 60
+
+# How long company names and currencies are reused, in seconds
+COMPANY_DETAILS_TTL = 24 * 60 * 60
+
+# How long symbol validation results are reused, in seconds
+SYMBOL_VALIDITY_TTL = 24 * 60 * 60
+INVALID_SYMBOL_TTL = 15 * 60
+
+# Allowed stock symbol format
+_SYMBOL_RE = re.compile(r"^[A-Z0-9.-]{1,8}$")
+
+# Stock info cache: symbol -> (fetch time, stock info), shared across threads
+_info_cache: Dict[str, Tuple[float, Dict]] = {}
+_info_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+# Symbol validation caches, positive and negative results kept separately
+_valid_symbols = TTLCache(maxsize=10_000, ttl=SYMBOL_VALIDITY_TTL)
+_invalid_symbols = TTLCache(maxsize=10_000, ttl=INVALID_SYMBOL_TTL)
+_symbol_cache_lock = threading.Lock()
+
+# Bounded pool for blocking Yahoo Finance calls that can run side by side
+IO_POOL_SIZE = 16
+_io_pool = ThreadPoolExecutor(max_workers=IO_POOL_SIZE)
+
+
+def _cache_get(symbol: str) -> Optional[Dict]:
+    """Return cached stock info for a symbol if it is still fresh."""
+    with _info_cache_lock:
+        entry = _info_cache.get(symbol)
+        if entry is not None and time.monotonic() - entry[0] < STOCK_INFO_TTL:
+            _cache_stats["hits"] += 1
+            stock_info = entry[1]
+        else:
+            _cache_stats["misses"] += 1
+            stock_info = None
+        hits, misses = _cache_stats["hits"], _cache_stats["misses"]
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Stock info cache %s for %s (hits=%d, misses=%d)",
+            "hit" if stock_info is not None else "miss",
+            symbol,
+            hits,
+            misses,
+        )
+    return stock_info
+
+
+def _cache_put(symbol: str, stock_info: Dict) -> None:
+    """Store freshly fetched stock info for a symbol."""
+    with _info_cache_lock:
+        _info_cache[symbol] = (time.monotonic(), stock_info)
+
+
+@cached(TTLCache(maxsize=1024, ttl=COMPANY_DETAILS_TTL), lock=threading.Lock())
+def _get_company_details(symbol: str) -> Dict:
+    """Fetch slow-changing company details for a symbol, cached for a day."""
+    info = yf.Ticker(symbol).info
+    return {
+        "name": info.get("longName", symbol),
+        "currency": info.get("currency", "USD"),
+        "market_cap": info.get("marketCap"),
+    }
+
+
+def _probe_symbol(symbol: str) -> bool:
+    """Check with Yahoo Finance whether a symbol has market data.
+
+    Valid symbols are remembered for a day and invalid ones for a shorter
+    time. Errors propagate so that transient failures are not cached.
+    """
+    with _symbol_cache_lock:
+        if symbol in _valid_symbols:
+            return True
+        if symbol in _invalid_symbols:
+            return False
+
+    info = yf.Ticker(symbol).info
+    valid = bool(info and info.get("regularMarketPrice") is not None)
+
+    with _symbol_cache_lock:
+        if valid:
+            _valid_symbols[symbol] = True
+        else:
+            _invalid_symbols[symbol] = True
+    return valid
+
+
+def _fast_info_value(fast_info, key: str):
+    """Read a field from yfinance's fast_info, returning None if unavailable."""
+    try:
+        return fast_info[key]
+    except (KeyError, AttributeError, TypeError, ValueError):
+        return None
+
+
+def _get_company_details_or_default(symbol: str) -> Dict:
+    """Get company details for a symbol, falling back to placeholders on error."""
+    try:
+        return _get_company_details(symbol)
+    except Exception as e:
+        logger.warning(f"Could not fetch company details for {symbol}: {e}")
+        return {"name": symbol, "currency": "USD", "market_cap": None}
+
 
 class StockService:
     """Service for fetching and processing stock data using Yahoo Finance API."""
 
+    @staticmethod
     @backoff.on_exception(
         backoff.expo,
-        (requests.exceptions.RequestException, Exception),
+        (requests.exceptions.RequestException, requests.exceptions.Timeout),
         max_tries=3,
+        raise_on_giveup=False,
     )
     def get_stock_info(symbol: str) -> Optional[Dict]:
         """Get current stock information for a given symbol.
@@ -27,33 +141,55 @@ class StockService:
         Returns:
             Dictionary containing stock information or None if error occurs
         """
+        cached = _cache_get(symbol)
+        if cached is not None:
+            return cached
+
         try:
             stock = yf.Ticker(symbol)
-            info = stock.info
+            fast_info = stock.fast_info
 
-            # Get current price and day's change
-            current_price = info.get("currentPrice")
-            previous_close = info.get("previousClose")
+            # Get current price and day's change from the lightweight quote
+            current_price = _fast_info_value(fast_info, "last_price")
+            previous_close = _fast_info_value(fast_info, "previous_close")
+            market_cap = _fast_info_value(fast_info, "market_cap")
+            volume = _fast_info_value(fast_info, "last_volume")
+            currency = _fast_info_value(fast_info, "currency")
+
+            if not current_price or not previous_close:
+                # Fall back to the full quote summary
+                info = stock.info
+                current_price = info.get("currentPrice")
+                previous_close = info.get("previousClose")
+                market_cap = info.get("marketCap")
+                volume = info.get("volume")
+                currency = info.get("currency")
 
             if not current_price or not previous_close:
                 logger.error(f"Could not get price data for {symbol}")
                 return None
 
+            details = _get_company_details_or_default(symbol)
             price_change = current_price - previous_close
             price_change_percent = (price_change / previous_close) * 100
 
-            return {
+            stock_info = {
                 "symbol": symbol,
-                "name": info.get("longName", symbol),
+                "name": details["name"],
                 "current_price": current_price,
                 "previous_close": previous_close,
                 "price_change": price_change,
                 "price_change_percent": price_change_percent,
-                "currency": info.get("currency", "USD"),
-                "market_cap": info.get("marketCap"),
-                "volume": info.get("volume"),
+                "currency": currency or details["currency"],
+                "market_cap": market_cap,
+                "volume": volume,
                 "timestamp": datetime.now().isoformat(),
             }
+            _cache_put(symbol, stock_info)
+            return stock_info
+        except requests.exceptions.RequestException:
+            # Network errors are retried by the backoff decorator
+            raise
         except Exception as e:
             logger.error(f"Error fetching data for {symbol}: {e}")
             return None
@@ -71,41 +207,108 @@ class StockService:
         if not symbols:
             return {}
 
-        # Use yfinance's multi-ticker functionality
-        tickers = yf.Tickers(" ".join(symbols))
-
+        # Serve fresh symbols from the cache and only fetch the rest
         results = {}
+        misses = []
         for symbol in symbols:
+            cached = _cache_get(symbol)
+            if cached is not None:
+                results[symbol] = cached
+            else:
+                misses.append(symbol)
+
+        if not misses:
+            return results
+
+        # Fetch recent daily closes for all missing symbols in one request
+        try:
+            data = yf.download(
+                " ".join(misses),
+                period="5d",
+                interval="1d",
+                group_by="ticker",
+                auto_adjust=False,
+                threads=True,
+                progress=False,
+            )
+        except Exception as e:
+            logger.error(f"Error downloading batch data for {misses}: {e}")
+            data = None
+
+        priced = []
+        failed = []
+        for symbol in misses:
             try:
-                ticker = tickers.tickers[symbol]
-                info = ticker.info
+                if data is None:
+                    raise ValueError("no batch data")
 
-                current_price = info.get("currentPrice")
-                previous_close = info.get("previousClose")
+                closes = data[symbol]["Close"].dropna()
+                if len(closes) < 2:
+                    raise ValueError("not enough price history")
 
-                if not current_price or not previous_close:
-                    logger.warning(f"Incomplete data for {symbol}")
-                    continue
-
-                price_change = current_price - previous_close
-                price_change_percent = (price_change / previous_close) * 100
-
-                results[symbol] = {
-                    "symbol": symbol,
-                    "name": info.get("longName", symbol),
-                    "current_price": current_price,
-                    "previous_close": previous_close,
-                    "price_change": price_change,
-                    "price_change_percent": price_change_percent,
-                    "currency": info.get("currency", "USD"),
-                    "market_cap": info.get("marketCap"),
-                    "volume": info.get("volume"),
-                    "timestamp": datetime.now().isoformat(),
-                }
+                current_price = float(closes.iloc[-1])
+                previous_close = float(closes.iloc[-2])
+                volumes = data[symbol]["Volume"].dropna()
+                volume = int(volumes.iloc[-1]) if len(volumes) else None
             except Exception as e:
-                logger.error(f"Error processing {symbol}: {e}")
+                logger.warning(f"Incomplete batch data for {symbol}: {e}")
+                failed.append(symbol)
+                continue
+
+            priced.append((symbol, current_price, previous_close, volume))
+
+        # Look up company details concurrently; they are cached for a day
+        details_list = _io_pool.map(
+            _get_company_details_or_default, [p[0] for p in priced]
+        )
+        for (symbol, current_price, previous_close, volume), details in zip(
+            priced, details_list
+        ):
+            price_change = current_price - previous_close
+            price_change_percent = (price_change / previous_close) * 100
 
-        return results
+            results[symbol] = {
+                "symbol": symbol,
+                "name": details["name"],
+                "current_price": current_price,
+                "previous_close": previous_close,
+                "price_change": price_change,
+                "price_change_percent": price_change_percent,
+                "currency": details["currency"],
+                "market_cap": details["market_cap"],
+                "volume": volume,
+                "timestamp": datetime.now().isoformat(),
+            }
+            _cache_put(symbol, results[symbol])
+
+        # Fall back to concurrent per-symbol lookups for anything the batch missed
+        for symbol, stock_info in zip(
+            failed, _io_pool.map(StockService.get_stock_info, failed)
+        ):
+            if stock_info:
+                results[symbol] = stock_info
+
+        # Keep the caller's symbol order
+        return {symbol: results[symbol] for symbol in symbols if symbol in results}
+
+    @staticmethod
+    def invalidate(symbol: Optional[str] = None) -> None:
+        """Drop cached stock information.
+
+        Args:
+            symbol: Stock symbol to drop, or None to clear the whole cache
+        """
+        with _info_cache_lock:
+            if symbol is None:
+                _info_cache.clear()
+            else:
+                _info_cache.pop(symbol.upper(), None)
+
+    @staticmethod
+    def clear_negative_cache() -> None:
+        """Forget symbols previously found to be invalid."""
+        with _symbol_cache_lock:
+            _invalid_symbols.clear()
 
     @staticmethod
     def format_stock_message(stock_info: Dict) -> str:
@@ -125,14 +328,32 @@ class StockService:
         currency = stock_info["currency"]
 
         # Format the message with emojis based on price change
-        emoji = "📈" if change >= 0 else "'📉"
+        emoji = "📈" if change >= 0 else "📉"
         sign = "+" if change >= 0 else ""
 
-        message = f"{emoji} {name} ({symbol})\n"
-        message += f"Price: {currency} {price:.2f}\n"
-        message += f"Change: {sign}{change:.2f} ({sign}{change_percent:.2f}%)\n"
+        return (
+            f"{emoji} {name} ({symbol})\n"
+            f"Price: {currency} {price:.2f}\n"
+            f"Change: {sign}{change:.2f} ({sign}{change_percent:.2f}%)\n"
+        )
+
+    @staticmethod
+    async def validate_many(symbols: List[str]) -> List[bool]:
+        """Validate several stock symbols concurrently.
+
+        Args:
+            symbols: Stock symbols to validate
 
-        return message
+        Returns:
+            List of validation results in the same order as symbols
+        """
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(_io_pool, StockService.validate_stock_symbol, s)
+                for s in symbols
+            )
+        )
 
     @staticmethod
     def validate_stock_symbol(symbol: str) -> bool:
@@ -148,17 +369,11 @@ class StockService:
             return False
 
         # Check for valid stock symbol format
-        if not re.match(r"^[A-Z0-9.-]{1,8}$", symbol):
+        if not _SYMBOL_RE.match(symbol):
             return False
 
         try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            return (
-                info
-                and "regularMarketPrice" in info
-                and info.get("regularMarketPrice") is not None
-            )
+            return _probe_symbol(symbol)
         except Exception as e:
             logger.error(f"Error validating symbol {symbol}: {e}")
             return False